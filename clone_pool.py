@@ -0,0 +1,52 @@
+import multiprocessing
+from emu_core import EmulatorCore
+
+# the core that every task clones from, in each worker process (set by `_init_worker`)
+_base_emu = None
+
+def _init_worker(emu:EmulatorCore):
+    global _base_emu
+    _base_emu = emu
+
+def _run_task(task:tuple):
+    func, arg = task
+    return func(_base_emu.clone(), arg)
+
+
+class ClonePool:
+    """
+    Runs a function on many clones of one emulator core, across forked worker processes.
+
+    The core's state is taken (as a headless clone) when the pool is created, and the worker processes
+    get it by forking, so it is never pickled - only the function, its arguments and the results are.
+    Each task then gets its own fresh clone in the worker, so tasks can't affect each other.
+
+    `func` is called as `func(emu_clone, arg)`, and must be picklable (defined at module level).
+    Only works where the 'fork' start method is available (not on Windows).
+
+    Example:
+        with ClonePool(emu) as pool:
+            results = pool.map(run_with_input, inputs)
+    """
+    def __init__(self, emu:EmulatorCore, processes:int=None):
+        context = multiprocessing.get_context('fork')
+        self._pool = context.Pool(processes, initializer=_init_worker, initargs=(emu.clone(),))
+
+    def map(self, func, args, chunksize:int=64) -> list:
+        """return a list of `func(clone, arg)` for each of `args` (in order)"""
+        return self._pool.map(_run_task, [(func, arg) for arg in args], chunksize)
+
+    def imap_unordered(self, func, args, chunksize:int=64):
+        """like `map()`, but returns an iterator which yields results as soon as they are ready (in any order)"""
+        return self._pool.imap_unordered(_run_task, ((func, arg) for arg in args), chunksize)
+
+    def close(self):
+        """stop the worker processes (after they finish any tasks)"""
+        self._pool.close()
+        self._pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -1,9 +1,11 @@
-from time import sleep
+from time import sleep, perf_counter
 import os
-from threading import Thread, Lock, Event
-import keyboard
-#import PyAudio
-from webview.window import Window
+from threading import Thread, Lock, Event, Condition
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from webview.window import Window   # only needed for type hints, so that importing this module never loads the GUI
+# backends for input (`keyboard`) and audio (`PyAudio`) are imported on first use, not here,
+# so that a headless core can be imported and constructed without them (`keyboard` also needs root on Linux)
 
 #################################################################
 # Classes to make CHIP-8 components
@@ -44,16 +46,26 @@ class FixedBitInt(FixedBit):
         """add `n` to value (can be negative for subtraction)"""
         self._val += n
 
+    def copy(self) -> 'FixedBitInt':
+        """return a new FixedBitInt with the same bit size and value"""
+        new = FixedBitInt(self._bit_size)
+        new._val = self._val
+        return new
+
 
 class FixedBitArray(FixedBit):
     """Create an array, where each item is an int with max bit size, and fixed length (number of items)"""
     def __init__(self, bit_size:int, length:int):
         super().__init__(bit_size)
         self._mem = [0] * length
+        self._shared = False            # True while `_mem` is shared with a copy (see `copy()`)
     
     def write(self, index:int, value:int):
         """Set value at array index to `value`. Value must be no more than `bit_size`"""
         self._ensure_bit_limit(value)
+        if self._shared:                # copy-on-write: get an own list before the first write after `copy()`
+            self._mem = self._mem[:]
+            self._shared = False
         self._mem[index] = value
 
     def read(self, index:int) -> int:
@@ -63,6 +75,17 @@ class FixedBitArray(FixedBit):
     def clear(self):
         """resets all array slots to 0"""
         self._mem = [0] * len(self._mem)
+        self._shared = False
+
+    def copy(self) -> 'FixedBitArray':
+        """Return a copy of the array. 
+        Both arrays share the same values until either one is written to, at which point it copies them (copy-on-write),
+        so copies that are only read from (like memory holding a program) cost almost nothing"""
+        new = FixedBitArray.__new__(FixedBitArray)
+        new._bit_size = self._bit_size
+        new._mem = self._mem
+        new._shared = self._shared = True
+        return new
 
 
 class FixedBitStack(FixedBit):
@@ -87,23 +110,50 @@ class FixedBitStack(FixedBit):
         """return value from top of the stack (but don't remove it)"""
         return self._stack[-1]
 
+    def __len__(self) -> int:
+        """number of values currently on the stack"""
+        return len(self._stack)
+
+    def copy(self) -> 'FixedBitStack':
+        """return a new FixedBitStack with the same bit size, max length and values"""
+        new = FixedBitStack(self._bit_size, self._len)
+        new._stack = self._stack[:]
+        return new
+
 
 class FixedBitCountDown(FixedBitInt):
-    """Works just like FixedBitInt, but decrements value by 1 at `rate` Hz while above 0"""
-    def __init__(self, bit_size:int, rate:int):
+    """Works just like FixedBitInt, but decrements value by 1 at `rate` Hz while above 0.
+    If `realtime` is False, no thread is ever started, and value is only decremented by calling `tick()`
+    (used for headless cores, which are run as fast as possible rather than in real time)"""
+    def __init__(self, bit_size:int, rate:int, realtime:bool=True):
         super().__init__(bit_size)
         self.rate = rate                # rate in Hz that value should be decremented
+        self.realtime = realtime        # if True, value is decremented by a thread in real time
         self.lock = Lock()              # used to safely access `_val` between threads
         self.flag = Event()             # used to make the _main_loop thread wait until `_val` is above 0
-        Thread(target=self._main_loop, daemon=True).start()     # call _main_loop in new thread
+        self.ticked = Condition(self.lock)  # notified each time value is decremented (see `wait_for_tick()`)
+        self._thread = None             # thread running _main_loop - only started once a value above 0 is first set
+        self.on_tick = None             # optional callable, called with the seconds since the previous tick each time value is decremented
+        self._last_tick = None          # time of the previous tick (None while not counting down)
+
+    def _observe_tick(self):
+        """call `on_tick` (if set) with the time since the previous tick"""
+        if self.on_tick is not None:
+            now = perf_counter()
+            if self._last_tick is not None:
+                self.on_tick(now - self._last_tick)
+            self._last_tick = now
 
     def _main_loop(self):
         while True:
             if self._val > 0:
                 with self.lock:
                     self._val -= 1
+                    self.ticked.notify_all()
+                self._observe_tick()
                 sleep(1/self.rate)      # wait time needed in order to run at `self.rate` Hz
             else:
+                self._last_tick = None
                 self.flag.clear()       # if value is not above 0, clear the flag
                 self.flag.wait()        # and wait until it's above 0 (flag will be set in `self.set()` if value is above 0)
 
@@ -117,9 +167,25 @@ class FixedBitCountDown(FixedBitInt):
         self._ensure_bit_limit(value)
         with self.lock:
             self._val = value
+            if value > 0 and self._thread is None and self.realtime:
+                self._thread = Thread(target=self._main_loop, daemon=True)  # call _main_loop in new thread (on first use)
+                self._thread.start()
         if value > 0:
             self.flag.set()             # set flag if value above 0
 
+    def tick(self):
+        """decrement value by 1 if above 0 (what the thread does `rate` times per second when `realtime` is True)"""
+        with self.lock:
+            if self._val > 0:
+                self._val -= 1
+                self.ticked.notify_all()
+
+    def wait_for_tick(self, timeout:float=None) -> bool:
+        """Block until value is next decremented, or until `timeout` seconds have passed. 
+        Returns False if it timed out (for example, because value is already 0)"""
+        with self.ticked:
+            return self.ticked.wait(timeout)
+
 
 class PlayTone():
     """used to generate and play a constant tone at `pitch` hz"""
@@ -129,6 +195,7 @@ class PlayTone():
     
     def start(self):
         pass
+        # the audio backend (PyAudio) should be imported here, on first use, rather than at module level
 
     def stop(self):
         pass
@@ -139,9 +206,9 @@ class PlayTone():
 
 class NoisyCountDown(FixedBitCountDown):
     """Works just like FixedBitCountDown, but will play a tone as long as the set value is above 0"""
-    def __init__(self, bit_size:int, rate:int):
+    def __init__(self, bit_size:int, rate:int, realtime:bool=True):
         self.tone = PlayTone(440)
-        super().__init__(bit_size, rate)
+        super().__init__(bit_size, rate, realtime)
     
     def _main_loop(self):
         while True:
@@ -150,8 +217,11 @@ class NoisyCountDown(FixedBitCountDown):
                     self.tone.start()   # if value is above 1, and the tone is not already playing, then start playing it
                 with self.lock:
                     self._val -= 1
+                    self.ticked.notify_all()
+                self._observe_tick()
                 sleep(1/self.rate)      # wait time needed in order to run at `self.rate` Hz
             else:
+                self._last_tick = None
                 self.flag.clear()       # if value is not above 0, clear the flag
                 self.tone.stop()        # and stop playing the tone
                 self.flag.wait()        # and wait until it's above 0 (flag will be set in `self.set()` if value is above 0)
@@ -166,32 +236,78 @@ class HexKeyPad:
             0xA: 'z', 0x0: 'x', 0xB: 'c', 0xF: 'v',
         }
         self._reversed_key_map = {value:key for key, value in self._key_map.items()}
+        self._keyboard = None           # `keyboard` module - imported on first use (see `_get_keyboard()`)
+
+    def _get_keyboard(self):
+        """Return the `keyboard` module, importing it the first time this is called"""
+        if self._keyboard is None:
+            import keyboard
+            self._keyboard = keyboard
+        return self._keyboard
     
     def is_key_pressed(self, key:int) -> bool:
         """Return True if key is pressed, otherwise False."""
         if not key in range(16):
             raise ValueError("`key` argument must be a hex number from 0 - F (0 - 15 in decimal)")
-        return keyboard.is_pressed(self._key_map.get(key))  # "Returns True if the key is pressed" - https://github.com/boppreh/keyboard#keyboard.is_pressed
+        return self._get_keyboard().is_pressed(self._key_map.get(key))  # "Returns True if the key is pressed" - https://github.com/boppreh/keyboard#keyboard.is_pressed
 
     def wait_for_keypress(self) -> int:
         """Block program until any of the keypad keys are pressed, and then return which key it was (hex value)"""
         while True:
-            keypress = keyboard.read_key()                  # "Blocks until a keyboard event happens, then returns that event's name or, if missing, its scan code." - # https://github.com/boppreh/keyboard#keyboardread_keysuppressfalse
+            keypress = self._get_keyboard().read_key()            # "Blocks until a keyboard event happens, then returns that event's name or, if missing, its scan code." - # https://github.com/boppreh/keyboard#keyboardread_keysuppressfalse
             if keypress in self._reversed_key_map:
                 return self._reversed_key_map.get(keypress)
 
 
+
+class HeadlessKeyPad:
+    """Keypad for headless cores (like clones), which never touches the host keyboard.
+    Keys are only pressed and released by calling `press()` and `release()`"""
+    def __init__(self, pressed:tuple=()):
+        self.pressed = set(pressed)     # hex values of the keys that are currently pressed
+
+    def press(self, key:int):
+        """press key (hex value)"""
+        self._ensure_key(key)
+        self.pressed.add(key)
+
+    def release(self, key:int):
+        """release key (hex value)"""
+        self._ensure_key(key)
+        self.pressed.discard(key)
+
+    def _ensure_key(self, key:int):
+        if not key in range(16):
+            raise ValueError("`key` argument must be a hex number from 0 - F (0 - 15 in decimal)")
+
+    def is_key_pressed(self, key:int) -> bool:
+        """Return True if key is pressed, otherwise False."""
+        self._ensure_key(key)
+        return key in self.pressed
+
+    def wait_for_keypress(self) -> int:
+        """Return the lowest pressed key (hex value). 
+        Nothing can press a key while this is waiting, so instead of blocking, None is returned if no key is pressed"""
+        return min(self.pressed) if self.pressed else None
+
+    def copy(self) -> 'HeadlessKeyPad':
+        """return a new HeadlessKeyPad with the same keys pressed"""
+        return HeadlessKeyPad(self.pressed)
+
+
 class Display:
     """
     Create a simple screen.
 
-    Instantiate with with int args for screen width and height, + a window object to render screen in the front-end
+    Instantiate with with int args for screen width and height, + a window object to render screen in the front-end.
+    `window` can be left as `None` for a headless display, in which case `draw_screen()` does nothing.
 
     Methods:
     * `get_cell()`      - get the state of a cell at an x,y coordinate in the screen matrix
     * `set_cell()`      - set the state of a cell at an x,y coordinate in the screen matrix
     * `reset()`         - reset screen matrix to completely off state
-    * `draw_screen()`   - actually draw the matrix to front end screen
+    * `draw_screen()`   - actually draw the matrix to front end screen (and pass it to each of `listeners`)
+    * `copy()`          - make a headless copy of the display
 
     In order to see any changes done in calls to `set_cell()` or `reset()`
     on the screen, a subsequent call to `draw_screen` must be made.
@@ -199,12 +315,14 @@ class Display:
     For get/set_cell methods, coordinates start at '0,0' at the top left corner.
     They range from `0` to `width/height - 1` (so a dimension of `10`, has a coordinate value range from `0` to `9`).
     """
-    def __init__(self, width:int, height:int, window:Window):
+    def __init__(self, width:int, height:int, window:'Window'=None):
         self.width = width              # screen width
         self.height = height            # screen height
         self._screen_matrix = []        # stores a list of lists of booleans, to store the state of each screen cell
         self.reset()                    # generate blank screen matrix data
         self.window = window            # Front-end window (used by display instruction)
+        self.on_draw = None             # optional callable, called with the seconds it took to push each frame to the front end
+        self.listeners = []             # callables which are each called with the screen matrix every time the screen is drawn (even if headless)
 
     def _enforce_xy_limit(self, x:int, y:int):
         """ensure that coordinate is within the screen width and height"""
@@ -222,12 +340,30 @@ class Display:
         assert isinstance(state, bool)
         self._screen_matrix[y][x] = state
 
+    def copy(self) -> 'Display':
+        """return a new headless Display (no window or listeners) with the same dimensions and screen state"""
+        new = Display.__new__(Display)
+        new.width = self.width
+        new.height = self.height
+        new._screen_matrix = [row[:] for row in self._screen_matrix]
+        new.window = None
+        new.on_draw = None
+        new.listeners = []
+        return new
+
     def reset(self):
         """Resets the screen so that all cells are in off state"""
         self._screen_matrix = [([False] * self.width) for row in range(self.height)]    # generate a list of lists of bools to represent screen matrix  
 
     def draw_screen(self):
-        """Send matrix state data to front end screen"""
+        """Send matrix state data to front end screen (and to any listeners)"""
+        for listener in self.listeners:
+            listener(self._screen_matrix)
+        if self.window is None:
+            return
         # all bools must be converted to ints before sending to js, because python bools don't get translated to js bools
         converted_screen = [[(1 if state else 0) for state in row] for row in self._screen_matrix]
+        start = perf_counter()
         self.window.evaluate_js(f"drawToScreen({converted_screen})")
+        if self.on_draw is not None:
+            self.on_draw(perf_counter() - start)
@@ -0,0 +1,18 @@
+import pytest
+from emu_core import EmulatorCore
+
+#################################################################
+# shared test fixtures
+
+@pytest.fixture
+def make_emu():
+    """Return a function which makes a headless core with `program` (a list of 16-bit instructions) loaded at 0x200.
+    Keyword args are passed on to `EmulatorCore`"""
+    def make(program:list, **kwargs) -> EmulatorCore:
+        emu = EmulatorCore(**kwargs)
+        for n, instruction in enumerate(program):
+            emu.memory.write(0x200 + n * 2, instruction >> 8)
+            emu.memory.write(0x201 + n * 2, instruction & 0xFF)
+        emu.pc.set(0x200)
+        return emu
+    return make
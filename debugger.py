@@ -0,0 +1,217 @@
+from emu_core import EmulatorCore
+
+#################################################################
+# Debugger for the CHIP-8 emulator core
+
+class BreakpointHit(Exception):
+    """Raised from the instrumented cycle when a breakpoint or watchpoint is hit.
+    `pc` and `opcode` are the address and value of the instruction the emulator stopped at (or just executed, for watchpoints)"""
+    def __init__(self, reason:str, pc:int, opcode:int):
+        super().__init__(reason)
+        self.pc = pc
+        self.opcode = opcode
+
+
+class Debugger:
+    """
+    Breakpoints and watchpoints for an `EmulatorCore`.
+
+    `EmulatorCore.cycle()` itself never checks for breakpoints. Instead, while anything is armed,
+    the debugger shadows the core's `cycle` method with its own instrumented version,
+    and as soon as nothing is armed anymore, the shadowing method is removed so that the core runs its normal (fast) `cycle()` again.
+    The core's `instrumented` flag is set while armed, which stops `EmulatorCore.run()` from fast-forwarding idle loops.
+    When a breakpoint or watchpoint is hit, the instrumented cycle raises `BreakpointHit`.
+
+    Methods:
+    * `add_breakpoint()`            - stop before executing the instruction at an address
+    * `add_opcode_breakpoint()`     - stop before executing any instruction matching an opcode pattern (like 'FX33')
+    * `add_memory_watchpoint()`     - stop after an instruction writes into a range of memory addresses
+    * `add_register_watchpoint()`   - stop after an instruction changes a V register (optionally only to a specific value)
+    * `remove_breakpoint()` / `clear()` - remove breakpoints/watchpoints
+    * `step()`                      - execute exactly one instruction, ignoring breakpoints at the current address
+    * `step_over()`                 - like `step()`, but runs through whole subroutine calls (2NNN)
+
+    Breakpoints can have a condition, which is either a callable taking the `EmulatorCore` and returning a bool,
+    or a python expression string (used by the front end) which can use the names:
+    `v` (list of the V registers), `pc`, `i`, `dt`, `st` and `sp` (stack depth). For example: `'v[3] == 0x10 and dt == 0'`
+    """
+    def __init__(self, emu:EmulatorCore):
+        self.emu = emu
+        self._breakpoints = {}          # address:condition - condition can be None
+        self._opcode_breakpoints = []   # list of (value, mask, condition) tuples - breaks if `opcode & mask == value`
+        self._memory_watchpoints = []   # list of (start, end) address ranges (end is exclusive)
+        self._register_watchpoints = {} # register:value - value can be None, to break on any change
+        self._step_over = None          # (return address, stack depth) of a subroutine call being stepped over
+        self._resume_pc = None          # address of the instruction that was stopped at, so that it isn't stopped at again when resuming
+
+    #---------
+    # Breakpoint/watchpoint methods
+
+    def add_breakpoint(self, address:int, condition=None):
+        """Stop before executing the instruction at `address` (if `condition` is given, only when it's true)"""
+        self._breakpoints[address] = self._compile_condition(condition)
+        self._update_cycle()
+
+    def remove_breakpoint(self, address:int):
+        """Remove the breakpoint at `address`"""
+        self._breakpoints.pop(address, None)
+        self._update_cycle()
+
+    def add_opcode_breakpoint(self, pattern, mask:int=0xFFFF, condition=None):
+        """Stop before executing any instruction matching `pattern`.
+        `pattern` is either an int (compared with `mask`), or a 4 character string like 'FX33' or 'D0YN' -
+        hex digits must match, and any other characters (X, Y, N) match any nibble"""
+        if isinstance(pattern, str):
+            pattern, mask = self._parse_pattern(pattern)
+        self._opcode_breakpoints.append((pattern & mask, mask, self._compile_condition(condition)))
+        self._update_cycle()
+
+    def add_memory_watchpoint(self, start:int, end:int=None):
+        """Stop after an instruction writes to any memory address from `start` up to (but not including) `end`.
+        If `end` is not given, only `start` is watched"""
+        self._memory_watchpoints.append((start, start + 1 if end is None else end))
+        self._update_cycle()
+
+    def add_register_watchpoint(self, register:int, value:int=None):
+        """Stop after an instruction changes the value of register V`register`.
+        If `value` is given, only stop when it's changed *to* that value"""
+        if not register in range(16):
+            raise ValueError("`register` argument must be a hex number from 0 - F (0 - 15 in decimal)")
+        self._register_watchpoints[register] = value
+        self._update_cycle()
+
+    def clear(self):
+        """Remove all breakpoints and watchpoints"""
+        self._breakpoints.clear()
+        self._opcode_breakpoints.clear()
+        self._memory_watchpoints.clear()
+        self._register_watchpoints.clear()
+        self._step_over = None
+        self._update_cycle()
+
+    def is_armed(self) -> bool:
+        """Return True if any breakpoint or watchpoint is set"""
+        return bool(self._breakpoints or self._opcode_breakpoints or self._memory_watchpoints
+            or self._register_watchpoints or self._step_over)
+
+    #---------
+    # Stepping methods
+
+    def step(self) -> int:
+        """Execute exactly one instruction, even if there's a breakpoint at it, and return the instruction.
+        Watchpoints can still be hit by the instruction (raising `BreakpointHit`)"""
+        if self.is_armed():             # (otherwise `cycle` is the plain one, which wouldn't use `_resume_pc`)
+            self._resume_pc = self.emu.pc.get()
+        return self.emu.cycle()
+
+    def step_over(self) -> bool:
+        """If the instruction at the current address is a subroutine call (2NNN), arm a temporary breakpoint
+        which is hit once the subroutine returns, and return True - the emulator should then be run to complete the call.
+        Otherwise nothing is done and False is returned (in which case stepping over is the same as `step()`)"""
+        pc = self.emu.pc.get()
+        if self._read_opcode(pc) >> 12 != 0x2:
+            return False
+        self._step_over = (pc + 2, len(self.emu.stack))
+        self._resume_pc = pc
+        self._update_cycle()
+        return True
+
+    #---------
+    # Internal methods
+
+    def _update_cycle(self):
+        """Shadow the core's `cycle` method with the instrumented one if anything is armed, otherwise remove it again"""
+        if self.is_armed():
+            self.emu.cycle = self._debug_cycle
+            self.emu.instrumented = True            # so `EmulatorCore.run()` doesn't fast-forward past any instructions
+        else:
+            self.emu.__dict__.pop('cycle', None)    # back to `EmulatorCore.cycle`, exactly as it is without a debugger
+            self.emu.instrumented = False
+            self._resume_pc = None                  # so a breakpoint added later at the same address isn't skipped
+
+    def _read_opcode(self, address:int) -> int:
+        return (self.emu.memory.read(address) << 8) + self.emu.memory.read(address + 1)
+
+    def _compile_condition(self, condition):
+        """Turn a condition expression string into a callable taking the core. Callables (and None) are returned as they are"""
+        if not isinstance(condition, str):
+            return condition
+        code = compile(condition, '<condition>', 'eval')
+        def check(emu:EmulatorCore) -> bool:
+            names = {
+                'v':    [emu.v_registers.read(r) for r in range(16)],
+                'pc':   emu.pc.get(),
+                'i':    emu.i.get(),
+                'dt':   emu.dt.get(),
+                'st':   emu.st.get(),
+                'sp':   len(emu.stack)
+            }
+            return bool(eval(code, {'__builtins__': {}}, names))
+        return check
+
+    @staticmethod
+    def _parse_pattern(pattern:str) -> tuple:
+        """Convert an opcode pattern string like 'FX33' to a (value, mask) tuple"""
+        if len(pattern) != 4:
+            raise ValueError("opcode pattern must be 4 characters long, like 'FX33'")
+        value = mask = 0
+        for char in pattern:
+            value <<= 4
+            mask <<= 4
+            if char in '0123456789abcdefABCDEF':
+                value += int(char, 16)
+                mask += 0xF
+        return value, mask
+
+    def _written_addresses(self, opcode:int) -> range:
+        """Return the memory addresses that an instruction is going to write to (only FX33 and FX55 write to memory)"""
+        if opcode & 0xF0FF == 0xF033:
+            return range(self.emu.i.get(), self.emu.i.get() + 3)
+        elif opcode & 0xF0FF == 0xF055:
+            return range(self.emu.i.get(), self.emu.i.get() + ((opcode & 0x0F00) >> 8) + 1)
+        return range(0)
+
+    def _debug_cycle(self) -> int:
+        """Instrumented version of `EmulatorCore.cycle()`, which checks all breakpoints and watchpoints"""
+        emu = self.emu
+        pc = emu.pc.get()
+        opcode = self._read_opcode(pc)
+
+        # work from copies, so breakpoints/watchpoints can be changed from another thread while this runs
+        opcode_breakpoints = tuple(self._opcode_breakpoints)
+        memory_watchpoints = tuple(self._memory_watchpoints)
+        register_watchpoints = dict(self._register_watchpoints)
+        step_over = self._step_over
+
+        # breakpoints - checked before executing the instruction
+        if pc == self._resume_pc:
+            self._resume_pc = None          # don't stop again at the instruction that was just stopped at
+        else:
+            condition = self._breakpoints.get(pc, False)
+            if condition is None or (condition and condition(emu)):
+                self._resume_pc = pc
+                raise BreakpointHit(f'breakpoint at {hex(pc)}', pc, opcode)
+            for value, mask, condition in opcode_breakpoints:
+                if opcode & mask == value and (condition is None or condition(emu)):
+                    self._resume_pc = pc
+                    raise BreakpointHit(f'opcode breakpoint at {hex(pc)}', pc, opcode)
+
+        # watchpoints - checked after executing the instruction
+        written = self._written_addresses(opcode)
+        registers = {r:emu.v_registers.read(r) for r in register_watchpoints}
+        instruction = EmulatorCore.cycle(emu)
+        for start, end in memory_watchpoints:
+            if written and written.start < end and start < written.stop:
+                raise BreakpointHit(f'memory write to {hex(max(start, written.start))}', pc, instruction)
+        for r, old_value in registers.items():
+            new_value = emu.v_registers.read(r)
+            if new_value != old_value and register_watchpoints[r] in (None, new_value):
+                raise BreakpointHit(f'register V{hex(r)[2:].upper()} changed to {hex(new_value)}', pc, instruction)
+        if step_over and step_over == (emu.pc.get(), len(emu.stack)):
+            return_address = step_over[0]
+            self._step_over = None
+            self._update_cycle()
+            if self.is_armed():
+                self._resume_pc = return_address    # don't stop again if there's also a breakpoint at the return address
+            raise BreakpointHit(f'stepped over call at {hex(return_address - 2)}', return_address, self._read_opcode(return_address))
+        return instruction
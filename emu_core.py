@@ -1,11 +1,21 @@
 from random import getrandbits
-from components import *
-from webview.window import Window
+from typing import TYPE_CHECKING
+from components import FixedBitInt, FixedBitArray, FixedBitStack, FixedBitCountDown, NoisyCountDown, HexKeyPad, HeadlessKeyPad, Display
+if TYPE_CHECKING:
+    from webview.window import Window
 
 class EmulatorCore():
-    """CHIP-8 Emulator Core. Contains all instructions and components"""
+    """CHIP-8 Emulator Core. Contains all instructions and components.
 
-    def __init__(self, fr_end_window:Window):
+    `fr_end_window` is the front-end window that the display is rendered in. 
+    Leave it as `None` to make a headless core (nothing is drawn, no GUI modules are imported, 
+    and the keypad is a `HeadlessKeyPad`, which never reads the host keyboard)
+
+    If `realtime_timers` is False, the delay and sound timers are not decremented by threads in real time,
+    but only when `tick_timers()` is called (so headless cores can be run faster than real time)
+    """
+
+    def __init__(self, fr_end_window:'Window'=None, realtime_timers:bool=True):
         # CHIP-8 components
         ## memory
         self.memory = FixedBitArray(8, 4096)    # 4KB (4,096 bytes) of RAM, where each cell is 1 byte
@@ -16,10 +26,10 @@ class EmulatorCore():
         self.pc = FixedBitInt(16)               # 16-bit program counter - points to the memory address of the current instruction
         self.i = FixedBitInt(16)                # 16-bit index register - stores memory addresses
         ### timers
-        self.dt = FixedBitCountDown(8, 60)      # 8-bit delay timer - automatically decremented at a rate of 60 Hz (60 times per second) until it reaches 0
-        self.st = NoisyCountDown(8, 60)         # 8-bit sound timer - functions like the delay timer, but which also gives off a beeping sound as long as it’s not 0
+        self.dt = FixedBitCountDown(8, 60, realtime_timers) # 8-bit delay timer - automatically decremented at a rate of 60 Hz (60 times per second) until it reaches 0
+        self.st = NoisyCountDown(8, 60, realtime_timers)    # 8-bit sound timer - functions like the delay timer, but which also gives off a beeping sound as long as it’s not 0
         ## keypad
-        self.keypad = HexKeyPad()               # 16-key hexadecimal keypad
+        self.keypad = HexKeyPad() if fr_end_window is not None else HeadlessKeyPad()   # 16-key hexadecimal keypad
         ## display
         self.display = Display(64, 32, fr_end_window)   # 64x32-pixel monochrome display
 
@@ -28,6 +38,8 @@ class EmulatorCore():
         self.screen_partial_wrap = False
             # ^ if set to True, then sprites which start within screen dimensions, but then *partially* go outside of them, 
             # will have this outside parts wrap around to the other side of the screen. If False, then they will be clipped
+        self.instrumented = False
+            # ^ set to True by a debugger while it has breakpoints/watchpoints set, so that `run()` doesn't fast-forward past them
 
     #---------
     # Instruction cycle methods
@@ -302,7 +314,12 @@ class EmulatorCore():
         ########## FX0A ########## - Wait for a key press, set Vx to value of key.
             elif n == 0xA:
                 # wait for a key to be pressed on keypad, and then set value of register Vx to hex value of the key that was pressed
-                self.v_registers.write(vx, self.keypad.wait_for_keypress())
+                key = self.keypad.wait_for_keypress()
+                if key is None:
+                    # a headless keypad with no key pressed doesn't block - instead, run this instruction again next cycle
+                    self.pc.add(-2)
+                else:
+                    self.v_registers.write(vx, key)
 
         ########## FX15 ########## - Set DT to Vx
             elif oc3 == 0x1 and n == 0x5:
@@ -349,6 +366,97 @@ class EmulatorCore():
                     # for each loop, write value at memory adress i+n, into register Vn
                     self.v_registers.write(n, self.memory.read(self.i.get() + n))
 
+    #---------
+    # State methods
+
+    def tick_timers(self):
+        """Decrement the delay and sound timers by 1 (if above 0). Only needed when the timers are not `realtime_timers`"""
+        self.dt.tick()
+        self.st.tick()
+
+    def idle_loop_length(self) -> int:
+        """If the instructions at the current pc are a polling loop which can't change anything 
+        until the delay timer ticks, return the number of instructions in one pass of the loop. Otherwise return 0.
+
+        The loops that are recognised are:
+        * `1NNN` - jump to itself
+        * `FX07`, `3XNN`, `1NNN` - set Vx to DT, skip the jump if Vx equals NN, jump back to `FX07` (waits for DT to reach NN)
+        * `FX07`, `4XNN`, `1NNN` - same, but skips the jump if Vx doesn't equal NN (waits for DT to change from NN)
+        """
+        pc = self.pc.get()
+        if pc > 0xFFA:                  # the loop would go past the end of memory
+            return 0
+        read = self.memory.read
+        instruction = (read(pc) << 8) + read(pc + 1)
+        if instruction == 0x1000 + pc:
+            return 1
+        if instruction & 0xF0FF == 0xF007 and (read(pc + 4) << 8) + read(pc + 5) == 0x1000 + pc:
+            skip = (read(pc + 2) << 8) + read(pc + 3)
+            if skip & 0x0F00 == instruction & 0x0F00:                   # skip instruction checks the same Vx
+                dt = self.dt.get()
+                if (skip >> 12 == 0x3 and dt != skip & 0xFF) or (skip >> 12 == 0x4 and dt == skip & 0xFF):
+                    return 3                                            # (only idle if the loop isn't about to exit)
+        return 0
+
+    def run(self, cycles:int, cycles_per_tick:int) -> int:
+        """Run `cycles` cycles as fast as possible, ticking the timers once every `cycles_per_tick` cycles 
+        (so for example, `cycles_per_tick=500//60` is like running at 500 Hz). Only for cores without `realtime_timers` (like clones).
+
+        Polling loops found by `idle_loop_length()` are fast-forwarded to the next timer tick, 
+        leaving the core in exactly the same state as running through them would.
+        (Except while `instrumented` is True, like when a debugger has breakpoints/watchpoints set - then every instruction is executed, so none are missed)
+        Returns the number of instructions that were actually executed"""
+        if self.dt.realtime:
+            raise ValueError('run() can only be used by cores without realtime timers')
+        n = 0                           # cycles run so far (executed or fast-forwarded)
+        executed = 0
+        until_tick = cycles_per_tick
+        while n < cycles:
+            if until_tick == 0:
+                self.tick_timers()
+                until_tick = cycles_per_tick
+            instruction = self.cycle()
+            n += 1
+            executed += 1
+            until_tick -= 1
+            # only loops ending in a jump are checked, and not while a debugger is watching every instruction
+            if instruction & 0xF000 == 0x1000 and not self.instrumented:
+                length = self.idle_loop_length()
+                if length:
+                    # skip as many whole passes of the loop as fit before the next tick (or the end of the run)
+                    skipped = min(until_tick, cycles - n) // length * length
+                    if skipped and length == 3:
+                        # every pass sets Vx to DT, which doesn't change until the next tick
+                        self.v_registers.write(self.memory.read(self.pc.get()) & 0xF, self.dt.get())
+                    n += skipped
+                    until_tick -= skipped
+        return executed
+
+    def clone(self) -> 'EmulatorCore':
+        """Return an independent, headless copy of the emulator in its current state.
+
+        The clone has no front-end window and no threads (its timers only change with `tick_timers()`).
+        It never reads the host keyboard either: its keypad is a `HeadlessKeyPad` (with the same keys pressed, if this core also has one),
+        whose keys are pressed with `clone.keypad.press()`.
+        Memory and registers are copy-on-write, so the program in memory is shared until either core writes to it
+        """
+        new = EmulatorCore.__new__(EmulatorCore)
+        new.memory = self.memory.copy()
+        new.stack = self.stack.copy()
+        new.v_registers = self.v_registers.copy()
+        new.pc = self.pc.copy()
+        new.i = self.i.copy()
+        new.dt = FixedBitCountDown(8, self.dt.rate, realtime=False)
+        new.dt._val = self.dt.get()
+        new.st = NoisyCountDown(8, self.st.rate, realtime=False)
+        new.st._val = self.st.get()
+        new.keypad = self.keypad.copy() if isinstance(self.keypad, HeadlessKeyPad) else HeadlessKeyPad()
+        new.display = self.display.copy()
+        new.font_mem_adr = self.font_mem_adr
+        new.screen_partial_wrap = self.screen_partial_wrap
+        new.instrumented = False
+        return new
+
     #---------
     # main method
 
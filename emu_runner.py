@@ -1,8 +1,12 @@
-from time import sleep
+from time import sleep, perf_counter
 from os import path
 from threading import Event, Lock, Thread
+import json
 import webview
 from emu_core import EmulatorCore
+from debugger import Debugger, BreakpointHit
+from metrics import MetricsRegistry
+from frame_stream import FrameStreamServer
 
 # a list to hold the sprite data of 16 hex characters for the display
 standard_font = [
@@ -41,10 +45,15 @@ class EmulatorRunner():
     def __init__(self):
         self.window = webview.create_window('CHIP-8 Emulator', html_path, width=1000, height=750)   # setup pywebview window, attaching HTML file
         self.emu = EmulatorCore(self.window)                                # Instantiate emulator core
+        self.debugger = Debugger(self.emu)                                  # breakpoints/watchpoints (costs nothing while none are set)
         self.loop = Event()             # used to run/pause emulation loop
         self.wv_loaded = Event()        # used to keep track of whether or not the webview window is running
         self.lock = Lock()              # used to safely change settings across threads
+        self.cycle_lock = Lock()        # held while executing instructions, so the loop thread and `step()` never run one at the same time
         self._emu_speed = 500           # an int representing the Hz (cycles per second) that the emulator's main loop should run at
+        self.show_metrics = False       # if True, run loop metrics are also shown in the front end infobar
+        self.frame_stream = None        # optional server streaming frames to other processes (see `start_frame_stream()`)
+        self._setup_metrics()
 
     #---------
     # Settings methods
@@ -79,8 +88,13 @@ class EmulatorRunner():
             raise ValueError('hz arg must be int')
         with self.lock:
             self._emu_speed = hz
+        self._target_hz.set(hz)
         print('emulation speed changed to', hz)
 
+    def set_show_metrics(self, show:bool):
+        """show (or stop showing) run loop metrics in the front end infobar"""
+        self.show_metrics = bool(show)
+
     #---------
     # Pywebview methods
 
@@ -95,6 +109,15 @@ class EmulatorRunner():
     #---
     # Misc
 
+    def start_frame_stream(self, host:str='127.0.0.1', port:int=0) -> tuple:
+        """start a server which streams every changed frame to any number of viewers (see `frame_stream.FrameStreamViewer`).
+        Returns the (host, port) address the server is listening on"""
+        if self.frame_stream is None:
+            self.frame_stream = FrameStreamServer(host, port)
+            self.frame_stream.start()
+            self.emu.display.listeners.append(self.frame_stream.publish)
+        return self.frame_stream.address
+
     def display_emu_props(self, instruction):
         """display emulator properties in the front end"""
         emu_props = {                       # dictionary of emulator properties
@@ -108,8 +131,123 @@ class EmulatorRunner():
         }
         for key in emu_props:               # convert all values in dict to uppercase hex strings (without '0x')
             emu_props[key] = hex(emu_props[key])[2:].upper()
+        if self.show_metrics:
+            emu_props['hz'] = f'{self._achieved_hz.value:.0f}/{self._target_hz.value}'
+            emu_props['frame ms'] = f'{self._frame_latency.value["mean"] * 1000:.2f}'
+            emu_props['dropped'] = self._dropped_frames.value
         # display emulator properties in front end, by evaluting js of a function call to `displayEmuState`:
+        start = perf_counter()
         self.window.evaluate_js(f"displayEmuState({emu_props})")
+        self._gui_call_latency.observe(perf_counter() - start)
+
+    #---------
+    # Metrics methods
+
+    def _setup_metrics(self):
+        """create the run loop metrics, and connect them to the display and timers"""
+        self.metrics = MetricsRegistry()
+        m = self.metrics
+        self._instructions = m.counter('chip8_instructions_total', 'instructions executed')
+        self._target_hz = m.gauge('chip8_target_cycles_per_second', 'emulation speed the run loop should run at')
+        self._achieved_hz = m.gauge('chip8_achieved_cycles_per_second', 'instructions the run loop actually executed per second (over the last second, including time waiting in idle loops)')
+        self._drift = m.gauge('chip8_cycle_rate_drift_ratio', 'achieved / target cycles per second - 1 (negative means running slow)')
+        self._oversleep = m.histogram('chip8_scheduler_oversleep_seconds', 'seconds slept past the requested cycle delay (idle loop waits are not included)')
+        self._gui_call_latency = m.histogram('chip8_gui_call_seconds', 'seconds taken by each evaluate_js call to update the infobar')
+        self._frame_latency = m.histogram('chip8_frame_push_seconds', 'seconds taken to push each frame to the front end screen')
+        self._frames = m.counter('chip8_frames_total', 'frames pushed to the front end screen')
+        self._dropped_frames = m.counter('chip8_frames_dropped_total', 'frames which took longer than one 60 Hz refresh to push (so missed it)')
+        self._idle_waits = m.counter('chip8_idle_waits_total', 'times the run loop waited for a timer tick instead of spinning through an idle loop')
+        self._idle_seconds = m.counter('chip8_idle_wait_seconds_total', 'seconds the run loop spent waiting in idle loops')
+        self._idle_ratio = m.gauge('chip8_idle_ratio', 'fraction of the last second the run loop spent waiting in idle loops')
+        self._tick_jitter = m.histogram('chip8_timer_tick_jitter_seconds', 'difference between actual and expected time between delay/sound timer ticks')
+        self._target_hz.set(self._emu_speed)
+        self._rate_window = (perf_counter(), 0, 0.0)    # (start time, instructions and idle seconds at start) of the current achieved Hz measurement
+
+        def on_draw(seconds:float):
+            self._frames.inc()
+            self._frame_latency.observe(seconds)
+            if seconds > 1/60:
+                self._dropped_frames.inc()
+        self.emu.display.on_draw = on_draw
+        for timer in (self.emu.dt, self.emu.st):
+            timer.on_tick = lambda seconds, rate=timer.rate: self._tick_jitter.observe(abs(seconds - 1/rate))
+
+    def _update_rate(self):
+        """update achieved cycles per second, drift and idle ratio roughly once a second"""
+        start, start_count, start_idle = self._rate_window
+        elapsed = perf_counter() - start
+        if elapsed >= 1:
+            achieved = (self._instructions.value - start_count) / elapsed
+            self._achieved_hz.set(achieved)
+            self._drift.set(achieved / self._target_hz.value - 1)
+            self._idle_ratio.set(min(1.0, (self._idle_seconds.value - start_idle) / elapsed))
+            self._rate_window = (start + elapsed, self._instructions.value, self._idle_seconds.value)
+
+    def get_metrics(self) -> dict:
+        """return a dict of all run loop metric names and their current values"""
+        return self.metrics.snapshot()
+
+    def dump_metrics(self, file_path:str):
+        """write all run loop metrics to `file_path` in the Prometheus text format"""
+        self.metrics.dump(file_path)
+
+    #---------
+    # Debugger methods
+
+    def _on_break(self, hit:BreakpointHit):
+        """pause emulation loop and show where the emulator stopped in the front end"""
+        self.loop.clear()
+        print('emulation loop stopped:', hit)
+        self.display_emu_props(hit.opcode)
+        self.window.evaluate_js(f"onBreak({json.dumps(str(hit))})")
+
+    def step(self):
+        """pause emulation loop (if running) and execute exactly one instruction"""
+        self.pause_loop()
+        with self.cycle_lock:           # wait for the loop thread to finish any instruction it's executing
+            try:
+                instruction = self.debugger.step()
+            except BreakpointHit as hit:
+                self._on_break(hit)
+                return
+        self.display_emu_props(instruction)
+
+    def step_over(self):
+        """like `step()`, but if the instruction is a subroutine call (2NNN), run until the subroutine has returned"""
+        self.pause_loop()
+        with self.cycle_lock:
+            stepping_over = self.debugger.step_over()
+        if stepping_over:
+            self.run_loop()
+        else:
+            self.step()
+
+    # breakpoint/watchpoint methods for the front end - these are called from pywebview's thread, 
+    # so `cycle_lock` is held to never change them part way through an instruction (see `debugger.Debugger` for what each does)
+
+    def add_breakpoint(self, address:int, condition:str=None):
+        with self.cycle_lock:
+            self.debugger.add_breakpoint(address, condition)
+
+    def remove_breakpoint(self, address:int):
+        with self.cycle_lock:
+            self.debugger.remove_breakpoint(address)
+
+    def add_opcode_breakpoint(self, pattern, mask:int=0xFFFF, condition:str=None):
+        with self.cycle_lock:
+            self.debugger.add_opcode_breakpoint(pattern, mask, condition)
+
+    def add_memory_watchpoint(self, start:int, end:int=None):
+        with self.cycle_lock:
+            self.debugger.add_memory_watchpoint(start, end)
+
+    def add_register_watchpoint(self, register:int, value:int=None):
+        with self.cycle_lock:
+            self.debugger.add_register_watchpoint(register, value)
+
+    def clear_breakpoints(self):
+        with self.cycle_lock:
+            self.debugger.clear()
 
     #---------
     # Main run methods
@@ -119,13 +257,47 @@ class EmulatorRunner():
         self.wv_loaded.wait()                   # wait until webview window is loaded
         # main loop:
         while True:
-            self.loop.wait()                    # if loop event is not set, wait until it is. Otherwise this does nothing
-            instruction = self.emu.cycle()      # execute one cycle
+            if not self.loop.is_set():
+                self.loop.wait()                # if loop event is not set, wait until it is
+                self._rate_window = (perf_counter(), self._instructions.value, self._idle_seconds.value)  # time spent paused doesn't count towards achieved speed
+            with self.cycle_lock:
+                if not self.loop.is_set():      # paused (for example by `step()`) while waiting for the lock
+                    continue
+                try:
+                    instruction = self.emu.cycle()  # execute one cycle
+                except BreakpointHit as hit:    # (only raised while the debugger has breakpoints/watchpoints set)
+                    self._on_break(hit)
+                    continue
+            self._instructions.inc()
             self.display_emu_props(instruction) # display emulator properties in front end
-            with self.lock:                     # lock is needed so that emulation speed can be changed while running!
-                sleep(1/self._emu_speed)
-                # enforce emulation speed by pausing execution for aproximiately
-                # the seconds spent for one cycle at `self.emu_speed` Hz
+            if instruction & 0xF000 == 0x1000 and self.emu.idle_loop_length():
+                # the program is in a polling loop which can't change anything until the delay timer ticks,
+                # so wait for the tick instead of spinning through the loop
+                self._idle_wait()
+            else:
+                with self.lock:                 # lock is needed so that emulation speed can be changed while running!
+                    delay = 1/self._emu_speed
+                    start = perf_counter()
+                    sleep(delay)
+                    # enforce emulation speed by pausing execution for aproximiately
+                    # the seconds spent for one cycle at `self.emu_speed` Hz
+                    self._oversleep.observe(perf_counter() - start - delay)
+            self._update_rate()
+
+    def _idle_wait(self):
+        """wait until the delay timer ticks, but never less than one cycle at the emulation speed"""
+        with self.lock:
+            delay = 1/self._emu_speed
+        self._idle_waits.inc()
+        start = perf_counter()
+        self.emu.dt.wait_for_tick(1/self.emu.dt.rate)
+        waited = perf_counter() - start
+        if waited < delay:
+            sleep(delay - waited)       # so idle loops never run faster than the emulation speed
+            waited = perf_counter() - start
+        # idle waits count towards achieved speed like any other time (so it shows real throughput), and are reported separately
+        # in the idle metrics. They aren't counted as scheduler oversleep though (there's no fixed delay to oversleep)
+        self._idle_seconds.inc(waited)
 
     def run_loop(self):
         """start emulation loop or resume if paused. If no CHIP-8 program/ROM has been loaded yet, this won't do much"""
@@ -152,7 +324,10 @@ class EmulatorRunner():
         self.window.events.loaded += self._on_loaded
         self.window.events.closed += self._on_closed
         # expose methods to JS domain so that they can be used by front-end js script
-        self.window.expose(self.get_program_then_load, self.set_emulation_speed, self.run_loop, self.pause_loop, self.reset)
+        self.window.expose(self.get_program_then_load, self.set_emulation_speed, self.set_show_metrics, self.run_loop, self.pause_loop, self.reset)
+        # and the debugger methods
+        self.window.expose(self.step, self.step_over, self.add_breakpoint, self.remove_breakpoint, 
+            self.add_opcode_breakpoint, self.add_memory_watchpoint, self.add_register_watchpoint, self.clear_breakpoints)
         # start main loop in new thread 
             # (this could be passed as first arg to `webview.start()` which would do the same thing, 
             # but it seems the thread is not daemon and program persists even after window is closed,
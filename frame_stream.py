@@ -0,0 +1,203 @@
+"""
+Streams display frames to any number of viewers over TCP.
+
+Each message is a header (`message type`, `frame number`, `payload length`), followed by the payload:
+* keyframe - screen width and height (1 byte each), then the packed frame:
+    each row is packed into bytes, 8 cells per byte, most significant bit first
+* delta    - (byte offset, XOR value) pairs for every byte of the packed frame that changed since the previous frame
+
+Every viewer gets a keyframe first, and after that only deltas - unless it falls behind.
+"""
+import socket
+import struct
+from threading import Thread, Lock, Event
+
+KEYFRAME = 0
+DELTA = 1
+header = struct.Struct('>BIH')          # message type, frame number, payload length
+delta_item = struct.Struct('>HB')       # byte offset, XOR value
+
+#################################################################
+# Functions to encode/decode frames
+
+def pack_frame(matrix:list) -> bytes:
+    """Pack a screen matrix (list of rows of bools) into bytes, 8 cells per byte"""
+    packed = bytearray()
+    for row in matrix:
+        row_bytes = (len(row) + 7) // 8
+        packed += int(''.join(['01'[cell] for cell in row]).ljust(row_bytes * 8, '0'), 2).to_bytes(row_bytes, 'big')
+    return bytes(packed)
+
+def unpack_frame(packed:bytes, width:int, height:int) -> list:
+    """Unpack bytes made by `pack_frame()` back into a screen matrix"""
+    row_bytes = (width + 7) // 8
+    matrix = []
+    for y in range(height):
+        bits = bin(int.from_bytes(packed[y * row_bytes:(y + 1) * row_bytes], 'big'))[2:].zfill(row_bytes * 8)
+        matrix.append([bit == '1' for bit in bits[:width]])
+    return matrix
+
+def encode_delta(old:bytes, new:bytes) -> bytes:
+    """Return the (offset, XOR value) pairs of all bytes that differ between two packed frames"""
+    return b''.join(delta_item.pack(n, a ^ b) for n, (a, b) in enumerate(zip(old, new)) if a != b)
+
+def apply_delta(frame:bytearray, delta:bytes):
+    """Apply a delta made by `encode_delta()` to a packed frame (in place)"""
+    for offset, value in delta_item.iter_unpack(delta):
+        frame[offset] ^= value
+
+
+#################################################################
+# Classes for the server and viewers
+
+class _Subscriber:
+    """A connected viewer. Only the latest unsent message is ever kept for it"""
+    def __init__(self, conn:socket.socket):
+        self.conn = conn
+        self.pending = None             # message waiting to be sent
+        self.needs_keyframe = True      # True until the viewer has been given a keyframe
+        self.lock = Lock()              # used to safely swap `pending` between the emulation thread and the sender thread
+        self.ready = Event()            # set when there's a pending message
+
+
+class FrameStreamServer:
+    """
+    Fans display frames out to any number of viewers over TCP.
+
+    Call `start()` to accept viewers, and `publish()` with the screen matrix each time the screen is drawn
+    (or add `publish` to `Display.listeners`).
+    Each changed frame is encoded once, no matter how many viewers there are, and every viewer has its own sender thread.
+    A viewer that can't keep up never slows down `publish()`: if its previous frame hasn't been sent yet,
+    that frame is dropped and replaced by a keyframe of the newest one (deltas can only be applied in order).
+
+    `address` is the (host, port) the server is listening on - port 0 picks any free port.
+    """
+    def __init__(self, host:str='127.0.0.1', port:int=0):
+        self._server = socket.create_server((host, port))
+        self.address = self._server.getsockname()
+        self._subscribers = []
+        self._lock = Lock()             # used to safely change subscribers and the latest frame across threads
+        self._frame = None              # latest packed frame
+        self._frame_number = 0
+        self._size = (0, 0)             # screen width and height
+        self._keyframe = None           # keyframe message of the latest frame (only made once a viewer needs it)
+        self.dropped_frames = 0         # number of frames not sent to a viewer because it was too slow
+
+    def start(self):
+        """start accepting viewers (in a new thread)"""
+        Thread(target=self._accept_loop, daemon=True).start()
+        print('frame stream server listening on', self.address)
+
+    def close(self):
+        """stop accepting viewers and disconnect all of them"""
+        self._server.close()
+        with self._lock:
+            for subscriber in self._subscribers:
+                subscriber.conn.close()
+                subscriber.ready.set()
+            self._subscribers.clear()
+
+    def viewer_count(self) -> int:
+        """number of connected viewers"""
+        with self._lock:
+            return len(self._subscribers)
+
+    def publish(self, matrix:list):
+        """Encode a screen matrix and queue it for every viewer. Does nothing if the frame didn't change"""
+        packed = pack_frame(matrix)
+        with self._lock:
+            if packed == self._frame:
+                return
+            old_frame = self._frame
+            self._frame = packed
+            self._frame_number = (self._frame_number + 1) & 0xFFFFFFFF
+            self._size = (len(matrix[0]), len(matrix))
+            self._keyframe = None
+            delta_message = None
+            if old_frame is not None and len(old_frame) == len(packed):
+                delta = encode_delta(old_frame, packed)
+                if len(delta) < len(packed):    # if the delta is bigger than the frame, just send keyframes
+                    delta_message = header.pack(DELTA, self._frame_number, len(delta)) + delta
+            for subscriber in self._subscribers:
+                with subscriber.lock:
+                    if subscriber.pending is not None or subscriber.needs_keyframe or delta_message is None:
+                        if subscriber.pending is not None:
+                            self.dropped_frames += 1
+                        subscriber.pending = self._get_keyframe()
+                        subscriber.needs_keyframe = False
+                    else:
+                        subscriber.pending = delta_message
+                    subscriber.ready.set()
+
+    def _get_keyframe(self) -> bytes:
+        """return keyframe message of the latest frame (must be called with `_lock` held)"""
+        if self._keyframe is None:
+            payload = bytes(self._size) + self._frame
+            self._keyframe = header.pack(KEYFRAME, self._frame_number, len(payload)) + payload
+        return self._keyframe
+
+    def _accept_loop(self):
+        while True:
+            try:
+                conn, addr = self._server.accept()
+            except OSError:             # server was closed
+                return
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            subscriber = _Subscriber(conn)
+            with self._lock:
+                if self._frame is not None:     # send the current screen straight away
+                    subscriber.pending = self._get_keyframe()
+                    subscriber.needs_keyframe = False
+                    subscriber.ready.set()
+                self._subscribers.append(subscriber)
+            Thread(target=self._send_loop, args=(subscriber,), daemon=True).start()
+
+    def _send_loop(self, subscriber:_Subscriber):
+        while True:
+            subscriber.ready.wait()
+            with subscriber.lock:
+                message = subscriber.pending
+                subscriber.pending = None
+                subscriber.ready.clear()
+            try:
+                if message is None:             # only happens when the server was closed
+                    raise OSError
+                subscriber.conn.sendall(message)    # blocks only this thread if the viewer is slow
+            except OSError:
+                with self._lock:
+                    if subscriber in self._subscribers:
+                        self._subscribers.remove(subscriber)
+                subscriber.conn.close()
+                return
+
+
+class FrameStreamViewer:
+    """Connects to a `FrameStreamServer`. Call `receive()` to get each frame"""
+    def __init__(self, host:str, port:int):
+        self._sock = socket.create_connection((host, port))
+        self._frame = None              # latest packed frame
+        self.width = 0
+        self.height = 0
+
+    def _read(self, n:int) -> bytes:
+        data = bytearray()
+        while len(data) < n:
+            chunk = self._sock.recv(n - len(data))
+            if not chunk:
+                raise ConnectionError('frame stream server disconnected')
+            data += chunk
+        return bytes(data)
+
+    def receive(self) -> tuple:
+        """Block until the next frame arrives, and return its frame number and screen matrix"""
+        message_type, frame_number, length = header.unpack(self._read(header.size))
+        payload = self._read(length)
+        if message_type == KEYFRAME:
+            self.width, self.height = payload[0], payload[1]
+            self._frame = bytearray(payload[2:])
+        else:
+            apply_delta(self._frame, payload)
+        return frame_number, unpack_frame(self._frame, self.width, self.height)
+
+    def close(self):
+        self._sock.close()
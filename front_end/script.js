@@ -5,8 +5,11 @@ const screen = document.querySelector(".screen");
 const infobox = document.querySelector(".info");
 const loadButton = document.querySelector(".load-program");
 const runButton = document.querySelector(".run-pause");
+const stepButton = document.querySelector(".step");
+const stepOverButton = document.querySelector(".step-over");
 const speedSlider = document.querySelector(".speed-slider");
 const speedBox = document.querySelector(".speed-box");
+const metricsBox = document.querySelector(".show-metrics");
 
 
 ////////////////////
@@ -59,6 +62,17 @@ function displayEmuState(props) {
     infobox.scroll(0, infobox.scrollHeight);            // scroll to bottom
 };
 
+/**
+ * Called by python when the emulator stops at a breakpoint or watchpoint
+ * @param {String} reason - description of what was hit
+*/
+function onBreak(reason) {
+    runButton.textContent = "Run";
+    runButton.style.color = "green";
+    infobox.insertAdjacentHTML('beforeend', `<b style="color:red">${reason}</b><br>`);
+    infobox.scroll(0, infobox.scrollHeight);
+};
+
 
 ////////////////////
 // Set actions and control logic for elements with listeners
@@ -88,6 +102,18 @@ runButton.addEventListener("click", function() {
     };
 });
 
+// debugger step buttons (stepping pauses the emulation loop)
+stepButton.addEventListener("click", function() {
+    runButton.textContent = "Run";
+    runButton.style.color = "green";
+    pywebview.api.step()
+});
+stepOverButton.addEventListener("click", function() {
+    runButton.textContent = "Run";
+    runButton.style.color = "green";
+    pywebview.api.step_over()                                   // if stepping over a call, this runs the loop until it has returned
+});
+
 //connect cycle-speed slider and speed box, and connect both to internal cycle speed function
 speedSlider.addEventListener("input", function() {
     speedBox.value = this.value
@@ -98,6 +124,11 @@ speedBox.addEventListener("input", function() {
     setSpeed(this.value)
 });
 
+// show run loop metrics (achieved Hz, frame push latency, dropped frames) in the infobar
+metricsBox.addEventListener("change", function() {
+    pywebview.api.set_show_metrics(this.checked)
+});
+
 ////////////////////////////////////////
 // starting script
 
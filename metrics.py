@@ -0,0 +1,127 @@
+from bisect import bisect_left
+from os import replace
+from threading import Lock
+
+# default histogram bucket upper bounds, in seconds
+default_buckets = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+#################################################################
+# Classes for metrics
+
+class Counter:
+    """A value that only goes up (like number of instructions executed)"""
+    kind = 'counter'
+
+    def __init__(self, name:str, help:str):
+        self.name = name
+        self.help = help
+        self.value = 0
+
+    def inc(self, n:int=1):
+        """increase value by `n`"""
+        self.value += n
+
+    def _prometheus_lines(self) -> list:
+        return [f'{self.name} {self.value}']
+
+
+class Gauge(Counter):
+    """A value that can go up and down (like achieved cycles per second)"""
+    kind = 'gauge'
+
+    def set(self, value:float):
+        """set value"""
+        self.value = value
+
+
+class Histogram:
+    """Counts observed values (like latencies in seconds) into buckets, and keeps their count and sum.
+    `buckets` are the upper bounds of each bucket, in increasing order (values above the last go in the '+Inf' bucket)"""
+    kind = 'histogram'
+
+    def __init__(self, name:str, help:str, buckets:tuple=default_buckets):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self.bucket_counts = [0] * (len(self.buckets) + 1)  # last one is for '+Inf'
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self.lock = Lock()              # histograms can be observed from more than one thread (like both timer threads)
+
+    def observe(self, value:float):
+        """add a value to the histogram"""
+        with self.lock:
+            self.bucket_counts[bisect_left(self.buckets, value)] += 1
+            self.count += 1
+            self.sum += value
+            self.max = max(self.max, value)
+
+    @property
+    def value(self) -> dict:
+        """summary of the histogram (count, mean and max of observed values)"""
+        return {'count': self.count, 'mean': (self.sum / self.count if self.count else 0.0), 'max': self.max}
+
+    def _prometheus_lines(self) -> list:
+        lines = []
+        cumulative = 0
+        for bound, n in zip(self.buckets + ('+Inf',), self.bucket_counts):
+            cumulative += n
+            lines.append(f'{self.name}_bucket{{le="{bound}"}} {cumulative}')
+        lines.append(f'{self.name}_sum {self.sum}')
+        lines.append(f'{self.name}_count {self.count}')
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Holds named metrics.
+
+    Methods:
+    * `counter()` / `gauge()` / `histogram()`   - create and register a new metric (or get the existing one with that name)
+    * `get()`           - get a metric by name
+    * `snapshot()`      - get a dict of all metric names and their current values
+    * `to_prometheus()` - get all metrics in the Prometheus text format
+    * `dump()`          - write all metrics in the Prometheus text format to a file
+    """
+    def __init__(self):
+        self._metrics = {}              # name:metric
+
+    def _register(self, metric_class, name:str, help:str, **kwargs):
+        if name not in self._metrics:
+            self._metrics[name] = metric_class(name, help, **kwargs)
+        elif type(self._metrics[name]) is not metric_class:
+            raise ValueError(f"a metric called '{name}' already exists, but is not a {metric_class.kind}")
+        return self._metrics[name]
+
+    def counter(self, name:str, help:str='') -> Counter:
+        return self._register(Counter, name, help)
+
+    def gauge(self, name:str, help:str='') -> Gauge:
+        return self._register(Gauge, name, help)
+
+    def histogram(self, name:str, help:str='', buckets:tuple=default_buckets) -> Histogram:
+        return self._register(Histogram, name, help, buckets=buckets)
+
+    def get(self, name:str):
+        """get metric called `name`"""
+        return self._metrics[name]
+
+    def snapshot(self) -> dict:
+        """return a dict of all metric names and their current values"""
+        return {name:metric.value for name, metric in self._metrics.items()}
+
+    def to_prometheus(self) -> str:
+        """return all metrics in the Prometheus text exposition format"""
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric._prometheus_lines())
+        return '\n'.join(lines) + '\n'
+
+    def dump(self, file_path:str):
+        """write all metrics to a file in the Prometheus text format (for example, for node_exporter's textfile collector)"""
+        with open(file_path + '.tmp', 'w') as file:
+            file.write(self.to_prometheus())
+        replace(file_path + '.tmp', file_path)     # replace the old file in one go, so it's never read half written
@@ -0,0 +1,137 @@
+import pytest
+from threading import Thread
+from debugger import Debugger, BreakpointHit
+
+#################################################################
+# tests for the debugger
+
+def test_fast_path_only_replaced_while_armed(make_emu):
+    emu = make_emu([0x6001])
+    debugger = Debugger(emu)
+    assert 'cycle' not in emu.__dict__
+    debugger.add_breakpoint(0x202)
+    assert emu.cycle == debugger._debug_cycle and emu.instrumented
+    debugger.remove_breakpoint(0x202)
+    assert 'cycle' not in emu.__dict__ and not emu.instrumented
+
+def test_breakpoint_and_resume(make_emu):
+    emu = make_emu([0x6001, 0x6102, 0x6203])
+    debugger = Debugger(emu)
+    debugger.add_breakpoint(0x202)
+    emu.cycle()
+    with pytest.raises(BreakpointHit) as hit:
+        emu.cycle()
+    assert hit.value.pc == 0x202 and hit.value.opcode == 0x6102
+    assert emu.v_registers.read(1) == 0     # instruction at the breakpoint was not executed
+    emu.cycle()                             # resuming executes it
+    assert emu.v_registers.read(1) == 2
+
+def test_conditional_breakpoint(make_emu):
+    emu = make_emu([0x7001, 0x1200])        # add 1 to V0 in a loop
+    debugger = Debugger(emu)
+    debugger.add_breakpoint(0x200, 'v[0] == 3')
+    with pytest.raises(BreakpointHit):
+        for _ in range(10):
+            emu.cycle()
+    assert emu.v_registers.read(0) == 3
+
+def test_opcode_breakpoint_pattern(make_emu):
+    emu = make_emu([0x6001, 0xA300, 0xF033])
+    debugger = Debugger(emu)
+    debugger.add_opcode_breakpoint('FX33')
+    emu.cycle()
+    emu.cycle()
+    with pytest.raises(BreakpointHit) as hit:
+        emu.cycle()
+    assert hit.value.opcode == 0xF033
+
+def test_memory_watchpoint(make_emu):
+    emu = make_emu([0x6001, 0xA300, 0xF155])
+    debugger = Debugger(emu)
+    debugger.add_memory_watchpoint(0x301, 0x310)
+    emu.cycle()
+    emu.cycle()
+    with pytest.raises(BreakpointHit):
+        emu.cycle()
+    assert emu.memory.read(0x300) == 1      # watchpoints stop after the instruction was executed
+
+def test_register_watchpoint(make_emu):
+    emu = make_emu([0x6001, 0x6202, 0x6205])
+    debugger = Debugger(emu)
+    debugger.add_register_watchpoint(2, 5)
+    emu.cycle()
+    emu.cycle()                             # V2 changes, but not to 5
+    with pytest.raises(BreakpointHit):
+        emu.cycle()
+
+def test_step_and_step_over(make_emu):
+    emu = make_emu([0x2206, 0x6101, 0x1204, 0x6001, 0x00EE])   # call subroutine at 0x206, which sets V0 and returns
+    debugger = Debugger(emu)
+    debugger.add_breakpoint(0x200)
+    assert debugger.step() == 0x2206        # step ignores the breakpoint at the current address
+    assert emu.pc.get() == 0x206
+    debugger.clear()
+    emu.pc.set(0x200)
+    emu.stack.pop()
+    assert debugger.step_over()
+    with pytest.raises(BreakpointHit) as hit:
+        for _ in range(10):
+            emu.cycle()
+    assert hit.value.pc == 0x202 and emu.v_registers.read(0) == 1
+    assert 'cycle' not in emu.__dict__      # temporary breakpoint is removed once hit
+    assert not debugger.step_over()         # 0x202 is not a call
+
+def test_no_stale_resume(make_emu):
+    emu = make_emu([0x6001, 0x6102, 0x1200])
+    debugger = Debugger(emu)
+    debugger.step()                         # nothing armed, so nothing is remembered about 0x200
+    emu.pc.set(0x200)
+    debugger.add_breakpoint(0x200)
+    with pytest.raises(BreakpointHit):
+        emu.cycle()
+    debugger.clear()                        # disarming after a hit forgets where it stopped
+    debugger.add_breakpoint(0x200)
+    with pytest.raises(BreakpointHit):
+        emu.cycle()
+
+def test_step_over_with_breakpoint_at_return_address(make_emu):
+    emu = make_emu([0x2206, 0x6101, 0x1204, 0x6001, 0x00EE])
+    debugger = Debugger(emu)
+    debugger.add_breakpoint(0x202)
+    assert debugger.step_over()
+    hits = []
+    for _ in range(10):
+        try:
+            emu.cycle()
+        except BreakpointHit as hit:
+            hits.append(str(hit))
+    assert hits == ['stepped over call at 0x200']
+
+def test_run_does_not_fast_forward_past_watchpoints(make_emu):
+    emu = make_emu([0x6005, 0xF015, 0xF107, 0x3100, 0x1204], realtime_timers=False)  # wait for DT to count down from 5
+    Debugger(emu).add_register_watchpoint(1, 3)
+    with pytest.raises(BreakpointHit):
+        emu.run(40, 8)
+    assert emu.v_registers.read(1) == 3
+
+def test_change_watchpoints_while_running(make_emu):
+    emu = make_emu([0x6300, 0x6301, 0x1200])    # keep changing V3
+    debugger = Debugger(emu)
+    debugger.add_breakpoint(0x300)
+    done = []
+    def change_watchpoints():
+        while not done:
+            debugger.add_register_watchpoint(3, 0)
+            debugger.clear()
+            debugger.add_breakpoint(0x300)
+    thread = Thread(target=change_watchpoints)
+    thread.start()
+    try:
+        for _ in range(20000):
+            try:
+                emu.cycle()
+            except BreakpointHit:               # (V3 changes to 0 while the watchpoint is set)
+                pass
+    finally:
+        done.append(True)
+        thread.join()
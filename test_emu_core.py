@@ -0,0 +1,114 @@
+import subprocess
+import sys
+import threading
+from os import path
+from emu_core import EmulatorCore
+from clone_pool import ClonePool
+
+#################################################################
+# tests for the CHIP-8 emulator core
+
+# max seconds allowed to import `emu_core` and construct a headless `EmulatorCore` (in a fresh interpreter)
+STARTUP_BUDGET = 0.25
+
+def test_headless_startup():
+    # run in a new interpreter, so that the import is not already cached by other tests
+    code = (
+        "import sys, threading\n"
+        "from time import perf_counter\n"
+        "t = perf_counter()\n"
+        "from emu_core import EmulatorCore\n"
+        "emu = EmulatorCore()\n"
+        "print(perf_counter() - t)\n"
+        "print(sorted({'keyboard', 'webview'} & set(sys.modules)))\n"
+        "print(threading.active_count())\n"
+    )
+    out = subprocess.run([sys.executable, '-c', code], cwd=path.dirname(path.abspath(__file__)),
+        capture_output=True, text=True, check=True).stdout.split('\n')
+    assert float(out[0]) < STARTUP_BUDGET   # import + construction stays within the startup budget
+    assert out[1] == '[]'                   # no GUI or input backends were loaded
+    assert out[2] == '1'                    # no timer threads are started until the timers are actually used
+
+def test_headless_keypad(make_emu):
+    emu = make_emu([0xE09E, 0xE0A1, 0x1200, 0xF10A])    # key opcodes on a headless core
+    emu.cycle()
+    emu.cycle()
+    assert emu.pc.get() == 0x206                # no key pressed, so EXA1 skipped the jump
+    emu.cycle()
+    assert emu.pc.get() == 0x206                # FX0A doesn't block, it runs again next cycle
+    assert 'keyboard' not in sys.modules        # the host keyboard was never touched
+
+def test_clone_is_independent(make_emu):
+    emu = make_emu([0x6005, 0xA300, 0xF033, 0x2208], realtime_timers=False)    # (so dt can't change while cloning)
+    emu.cycle()
+    emu.dt.set(10)
+    threads = threading.active_count()
+    clone = emu.clone()
+    assert threading.active_count() == threads      # clones don't start any threads
+    assert clone.memory._mem is emu.memory._mem     # memory is shared until written to
+    for _ in range(3):
+        clone.cycle()
+    assert clone.memory.read(0x302) == 5 and emu.memory.read(0x302) == 0
+    assert clone.stack.peek() == 0x208 and len(emu.stack) == 0
+    assert clone.pc.get() == 0x208 and emu.pc.get() == 0x202
+    assert clone.v_registers.read(0) == emu.v_registers.read(0) == 5
+    clone.tick_timers()
+    assert clone.dt.get() == 9
+
+def test_clone_keypad_is_headless(make_emu):
+    emu = make_emu([0xE09E, 0xF10A])           # skip if key V0 is pressed, then wait for a key press into V1
+    clone = emu.clone()
+    clone.cycle()
+    assert clone.pc.get() == 0x202              # no key pressed (and the host keyboard is never read)
+    clone.cycle()
+    assert clone.pc.get() == 0x202              # FX0A doesn't block, it runs again next cycle
+    clone.keypad.press(0xB)
+    assert clone.clone().keypad.is_key_pressed(0xB)
+    clone.cycle()
+    assert clone.v_registers.read(1) == 0xB and clone.pc.get() == 0x204
+
+def set_v1_and_run(emu:EmulatorCore, value:int) -> int:
+    emu.v_registers.write(1, value)
+    emu.cycle()
+    return emu.v_registers.read(0)
+
+def test_clone_pool(make_emu):
+    emu = make_emu([0x8014])                        # V0 += V1
+    emu.v_registers.write(0, 1)
+    with ClonePool(emu, processes=2) as pool:
+        assert pool.map(set_v1_and_run, range(10)) == [n + 1 for n in range(10)]
+
+def test_idle_loop_length(make_emu):
+    emu = make_emu([0x1200])
+    assert emu.idle_loop_length() == 1
+    emu = make_emu([0xF307, 0x3300, 0x1200])    # wait until DT is 0
+    assert emu.idle_loop_length() == 0          # DT is already 0, so the loop is about to exit
+    emu.dt.set(3)
+    assert emu.idle_loop_length() == 3
+    emu = make_emu([0xF307, 0x3400, 0x1200])    # skip checks a different register
+    emu.dt.set(3)
+    assert emu.idle_loop_length() == 0
+
+def test_run_fast_forwards_idle_loops(make_emu):
+    emu = make_emu([0x6005, 0xF015, 0xF107, 0x3100, 0x1204, 0x6A01, 0x120C])
+    reference = emu.clone()
+    emu = emu.clone()                           # (clone has no realtime timers)
+    executed = emu.run(1000, 8)
+    for n in range(1000):                       # same thing, without fast-forwarding
+        if n and n % 8 == 0:
+            reference.tick_timers()
+        reference.cycle()
+    assert executed < 1000 // 4                 # (at least the first instruction after each tick is still executed)
+    assert emu.pc.get() == reference.pc.get() == 0x20C
+    assert emu.v_registers._mem == reference.v_registers._mem
+    assert emu.dt.get() == reference.dt.get() == 0
+    # stopping part way through a loop also leaves the same state
+    emu = make_emu([0x6005, 0xF015, 0xF107, 0x3100, 0x1204]).clone()
+    reference = emu.clone()
+    emu.run(20, 8)
+    for n in range(20):
+        if n and n % 8 == 0:
+            reference.tick_timers()
+        reference.cycle()
+    assert emu.pc.get() == reference.pc.get()
+    assert emu.v_registers._mem == reference.v_registers._mem
@@ -2,12 +2,12 @@
 This uses a chip8 file called 'test_opcode.ch8' gotten from: https://github.com/corax89/chip8-test-rom.
 This file should be in a folder called "ch8_programs", that is itself within this script's directory
 """
-import emu_runner
 from time import sleep
 from threading import Thread
 from os import path
 
 if __name__ == "__main__":
+    import emu_runner               # imported here so that collecting this file (e.g. by pytest) doesn't load the GUI
     emu = emu_runner.EmulatorRunner()
 
     def run_opcode_test_prog():
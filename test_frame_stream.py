@@ -0,0 +1,55 @@
+from random import getrandbits
+from time import sleep, perf_counter
+from frame_stream import FrameStreamServer, FrameStreamViewer, pack_frame, unpack_frame, encode_delta, apply_delta
+
+#################################################################
+# tests for frame streaming
+
+def random_matrix(width:int=64, height:int=32) -> list:
+    return [[bool(getrandbits(1)) for x in range(width)] for y in range(height)]
+
+def wait_for_viewers(server:FrameStreamServer, n:int):
+    for _ in range(100):
+        if server.viewer_count() == n:
+            return
+        sleep(0.01)
+    raise TimeoutError(f'expected {n} viewers to connect, but {server.viewer_count()} did')
+
+def test_pack_and_delta():
+    old, new = random_matrix(), random_matrix()
+    assert unpack_frame(pack_frame(new), 64, 32) == new
+    frame = bytearray(pack_frame(old))
+    apply_delta(frame, encode_delta(pack_frame(old), pack_frame(new)))
+    assert bytes(frame) == pack_frame(new)
+
+def test_stream_to_viewers():
+    server = FrameStreamServer()
+    server.start()
+    viewers = [FrameStreamViewer(*server.address) for _ in range(3)]
+    wait_for_viewers(server, 3)
+    screen = [[False] * 64 for y in range(32)]
+    for n in range(5):
+        screen[n][n] = True                 # small changes, which are sent as deltas
+        server.publish(screen)
+        for viewer in viewers:
+            assert viewer.receive() == (n + 1, screen)
+    server.publish(screen)                  # unchanged frames are not sent
+    server.close()
+
+def test_slow_viewer_does_not_block():
+    server = FrameStreamServer()
+    server.start()
+    viewer = FrameStreamViewer(*server.address)
+    wait_for_viewers(server, 1)
+    frames = [random_matrix() for _ in range(2000)]
+    start = perf_counter()
+    for frame in frames:                    # viewer isn't reading while these are published
+        server.publish(frame)
+    assert perf_counter() - start < 5
+    assert server.dropped_frames > 0            # stale frames were dropped instead of queued for the viewer
+    # once it catches up, the viewer ends up with the latest frame
+    n = 0
+    while n != len(frames):
+        n, screen = viewer.receive()
+    assert screen == frames[-1]
+    server.close()
@@ -0,0 +1,36 @@
+import pytest
+from metrics import MetricsRegistry
+
+#################################################################
+# tests for run loop metrics
+
+def test_registry_snapshot():
+    m = MetricsRegistry()
+    m.counter('instructions_total').inc(3)
+    m.gauge('hz').set(499.5)
+    h = m.histogram('latency_seconds', buckets=(0.001, 0.01))
+    h.observe(0.0005)
+    h.observe(0.02)
+    assert m.counter('instructions_total') is m.get('instructions_total')    # existing metric is returned
+    assert m.snapshot() == {'instructions_total': 3, 'hz': 499.5, 'latency_seconds': {'count': 2, 'mean': 0.01025, 'max': 0.02}}
+    with pytest.raises(ValueError):
+        m.gauge('instructions_total')
+
+def test_prometheus_dump(tmp_path):
+    m = MetricsRegistry()
+    m.counter('frames_total', 'frames pushed').inc()
+    h = m.histogram('frame_seconds', 'frame push latency', buckets=(0.001, 0.01))
+    h.observe(0.005)
+    m.dump(str(tmp_path / 'chip8.prom'))
+    assert (tmp_path / 'chip8.prom').read_text() == (
+        '# HELP frames_total frames pushed\n'
+        '# TYPE frames_total counter\n'
+        'frames_total 1\n'
+        '# HELP frame_seconds frame push latency\n'
+        '# TYPE frame_seconds histogram\n'
+        'frame_seconds_bucket{le="0.001"} 0\n'
+        'frame_seconds_bucket{le="0.01"} 1\n'
+        'frame_seconds_bucket{le="+Inf"} 1\n'
+        'frame_seconds_sum 0.005\n'
+        'frame_seconds_count 1\n'
+    )